@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Dump the combined listener grammars to grammars/*.json.
+
+KaldiRecognizer takes its grammar as a JSON string, so pre-dumping it at
+build/deploy time lets each listener start with a single file read
+instead of list concatenation + json.dumps per process. Filenames are
+content-hashed (phrases.grammar_cache_name), so stale files from an old
+phrase set or ASSISTANT_NAME are never picked up — the listeners fall
+back to building the grammar in-process and re-cache it under the new
+name if this script hasn't run.
+"""
+import glob
+import json
+import os
+
+import phrases
+
+OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grammars")
+
+
+def main():
+  os.makedirs(OUT_DIR, exist_ok=True)
+  for name, grammar in (
+    ("wake", phrases.WAKE_GRAMMAR),
+    ("shutdown", phrases.SHUTDOWN_GRAMMAR),
+  ):
+    fname = phrases.grammar_cache_name(name, grammar)
+    for stale in glob.glob(os.path.join(OUT_DIR, f"{name}-*.json")):
+      if os.path.basename(stale) != fname:
+        os.remove(stale)
+    path = os.path.join(OUT_DIR, fname)
+    with open(path, "w") as f:
+      f.write(json.dumps(grammar))
+    print(f"wrote {path} ({len(grammar)} phrases)")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,550 @@
+"""Shared capture + recognition core for the wake and shutdown listeners.
+
+Loads the Vosk model once per process and fans every captured audio chunk
+to any number of grammar-constrained recognizers over a single mic stream,
+so a listener process never pays for duplicate model RAM, acoustic-model
+passes, or capture pipes. Entry scripts (wake.py, shutdown_listener.py)
+define their grammars and result handlers and call run().
+"""
+import sys, json, os, re, subprocess
+import collections
+import fcntl
+import math
+import select
+import signal
+import threading
+import time
+
+# vosk_loader pins BLAS threading and quiets Kaldi before vosk loads.
+from vosk_loader import get_model
+from vosk import KaldiRecognizer
+
+import phrases
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GRAMMAR_DIR = os.path.join(SCRIPT_DIR, "grammars")
+
+SR = int(os.getenv("WAKE_SR", "16000"))
+# 1600 frames = 100 ms at 16 kHz. Small blocks put a low floor on
+# time-to-wake; the VAD gate keeps the extra AcceptWaveform calls off the
+# decoder during silence and redraws are throttled separately, so the
+# per-chunk overhead larger blocks used to amortize is mostly gone.
+# Override with WAKE_BLOCK.
+BLOCK = int(os.getenv("WAKE_BLOCK", "1600"))
+
+# Voiced audio is accumulated to ~this many ms before one AcceptWaveform
+# call: BLOCK stays small for VAD/meter latency while the decoder still
+# sees large writes (fewer Python<->C transitions, more frames per NN
+# scorer pass). The batch is flushed early when the gate closes.
+BATCH_BYTES = int(os.getenv("WAKE_BATCH_MS", "300")) * SR * 2 // 1000
+
+LINUX_CHANNELS = int(os.getenv("WAKE_CHANNELS", "2"))
+LINUX_DEVICE = os.getenv("WAKE_ARECORD_DEVICE", "mic_share")
+
+IS_LINUX = sys.platform.startswith("linux")
+
+def _load_grammar(name, phrase_list) -> str:
+  """Content-keyed grammar cache under grammars/.
+
+  The filename carries a hash of the phrase list (grammar_cache_name),
+  so changing the lists or ASSISTANT_NAME makes stale files invisible
+  rather than silently preferred. On a miss the grammar is dumped once
+  and cached — listener processes restart on every wake/sleep cycle, so
+  later starts get the single-read path too. build_grammars.py prebuilds
+  the same filenames on deploy.
+  """
+  path = None
+  if name:
+    path = os.path.join(GRAMMAR_DIR, phrases.grammar_cache_name(name, phrase_list))
+    try:
+      with open(path) as f:
+        return f.read()
+    except OSError:
+      pass
+
+  grammar = json.dumps(phrase_list)
+  if path:
+    try:
+      os.makedirs(GRAMMAR_DIR, exist_ok=True)
+      with open(path, "w") as f:
+        f.write(grammar)
+    except OSError:
+      pass
+  return grammar
+
+def make_recognizer(phrase_list: list, name: str = None) -> KaldiRecognizer:
+  """Build a grammar-constrained recognizer on the shared model."""
+  try:
+    # Newer Vosk bindings take the phrase list directly and serialize in C.
+    rec = KaldiRecognizer(get_model(), SR, phrase_list)
+  except TypeError:
+    rec = KaldiRecognizer(get_model(), SR, _load_grammar(name, phrase_list))
+  # We only ever read the text field; skip word timings and N-best work.
+  rec.SetWords(False)
+  rec.SetPartialWords(False)
+  rec.SetMaxAlternatives(0)
+  return rec
+
+# Vosk results are flat JSON; we only ever read one string field, so pull it
+# out with a regex instead of json.loads allocating a dict per result.
+_TEXT_RE = re.compile(r'"text"\s*:\s*"([^"]*)"')
+_PARTIAL_RE = re.compile(r'"partial"\s*:\s*"([^"]*)"')
+
+def result_text(raw: str) -> str:
+  m = _TEXT_RE.search(raw)
+  return m.group(1) if m else ""
+
+def partial_text(raw: str) -> str:
+  m = _PARTIAL_RE.search(raw)
+  return m.group(1) if m else ""
+
+# Bytes-level variants: newer bindings expose ResultBytes /
+# PartialResultBytes, which skips decoding the whole result JSON to str
+# just to extract one short field.
+_TEXT_RE_B = re.compile(rb'"text"\s*:\s*"([^"]*)"')
+_PARTIAL_RE_B = re.compile(rb'"partial"\s*:\s*"([^"]*)"')
+
+def _result_text_of(rec) -> str:
+  result_bytes = getattr(rec, "ResultBytes", None)
+  if result_bytes is not None:
+    m = _TEXT_RE_B.search(result_bytes())
+    return m.group(1).decode("utf-8", errors="replace") if m else ""
+  return result_text(rec.Result())
+
+def _partial_of(rec):
+  """Raw partial result — bytes on newer bindings, str otherwise."""
+  partial_bytes = getattr(rec, "PartialResultBytes", None)
+  return partial_bytes() if partial_bytes is not None else rec.PartialResult()
+
+def _partial_text_of(raw) -> str:
+  if isinstance(raw, bytes):
+    m = _PARTIAL_RE_B.search(raw)
+    return m.group(1).decode("utf-8", errors="replace") if m else ""
+  return partial_text(raw)
+
+# Energy gate: chunks quieter than this (mean |sample| on int16, ~ -40 dBFS)
+# skip the decoder entirely — the dominant savings for an always-on
+# listener, where most chunks are silence. Override with WAKE_VAD_LEVEL;
+# 0 disables the gate.
+VAD_LEVEL = int(os.getenv("WAKE_VAD_LEVEL", "300"))
+
+# Hangover is wall time, not a block count, so changing BLOCK can't
+# shrink it. It must outlast Vosk's endpointing silence (~0.5 s for
+# rule2, 1.0 s for rule3): the gate Reset() discards anything that
+# hasn't finalized, so closing earlier than the endpointer would drop
+# utterances in a quiet room.
+VAD_HANGOVER_SEC = float(os.getenv("WAKE_VAD_HANGOVER", "1.0"))
+_HANGOVER_BLOCKS = max(3, math.ceil(VAD_HANGOVER_SEC * SR / BLOCK))
+
+def chunk_level(data) -> int:
+  """Mean absolute sample value of an int16 chunk."""
+  pcm = memoryview(data).cast("h")  # zero-copy int16 view of the chunk
+  return sum(map(abs, pcm)) // len(pcm)
+
+class _VadGate:
+  """Decides whether a chunk is worth decoding.
+
+  Keeps passing a hangover of silent chunks after speech so Vosk sees the
+  trailing silence it needs to finalize the pending utterance; the gate
+  only closes after that many consecutive silent blocks. closed_edge is
+  True on the block where it closes, so the loop can Reset() the
+  recognizers and drop any half-decoded state.
+  """
+
+  def __init__(self, hangover_blocks=_HANGOVER_BLOCKS):
+    self._hangover_blocks = hangover_blocks
+    self._hangover = hangover_blocks  # decode leading audio at startup
+    self.closed_edge = False
+
+  def voiced(self, level: int) -> bool:
+    self.closed_edge = False
+    if level >= VAD_LEVEL:
+      self._hangover = self._hangover_blocks
+      return True
+    if self._hangover:
+      self._hangover -= 1
+      if not self._hangover:
+        self.closed_edge = True
+      return True
+    return False
+
+class _Batch:
+  """Accumulates voiced chunks until there's BATCH_BYTES worth to decode."""
+
+  __slots__ = ("_buf",)
+
+  def __init__(self):
+    self._buf = bytearray()
+
+  def add(self, chunk):
+    """Buffer a chunk; returns the batch to decode once full, else None."""
+    buf = self._buf
+    buf += chunk
+    if len(buf) < BATCH_BYTES:
+      return None
+    out = bytes(buf)
+    del buf[:]
+    return out
+
+  def flush(self):
+    """Returns whatever is buffered (None if empty); used on gate close."""
+    buf = self._buf
+    if not buf:
+      return None
+    out = bytes(buf)
+    del buf[:]
+    return out
+
+# All 31 possible bar strings, built once instead of two repeats + concat
+# per draw.
+_BAR_WIDTH = 30
+_BARS = tuple('█' * i + '░' * (_BAR_WIDTH - i) for i in range(_BAR_WIDTH + 1))
+
+def audio_level_bar(level, width=_BAR_WIDTH):
+  normalized = min(1.0, level * 10 / 32768.0)
+  filled = int(normalized * width)
+  if width == _BAR_WIDTH:
+    return _BARS[filled]
+  return '█' * filled + '░' * (width - filled)
+
+def downmix_to_mono(raw_bytes: bytes, channels: int) -> bytes:
+  if channels > 1:
+    # Strided view over the raw bytes; the only copy is tobytes() emitting
+    # just the ch0 samples (half the input for stereo).
+    return memoryview(raw_bytes).cast("h")[::channels].tobytes()
+  return raw_bytes
+
+# PartialResult usually repeats the same JSON for many consecutive blocks;
+# cache the last raw string per recognizer and only re-run the regex when
+# it actually changes (a string compare is much cheaper than a search).
+_partial_cache = {}
+
+def _process_chunk(recognizers, chunk) -> tuple:
+  """Feed one chunk to every recognizer. Returns (done, partial_text)."""
+  partial = ""
+  for rec, on_text in recognizers:
+    if rec.AcceptWaveform(chunk):
+      _partial_cache.pop(id(rec), None)
+      if on_text(_result_text_of(rec)):
+        return True, partial
+    else:
+      raw = _partial_of(rec)
+      cached = _partial_cache.get(id(rec))
+      if cached is None or cached[0] != raw:
+        cached = (raw, _partial_text_of(raw))
+        _partial_cache[id(rec)] = cached
+      partial = partial or cached[1]
+  return False, partial
+
+def _boost_scheduling():
+  """Best-effort soft-realtime priority for the capture/decode loop.
+
+  SCHED_FIFO needs CAP_SYS_NICE; without it this is a silent no-op, so the
+  listeners still run fine as a plain user process.
+  """
+  try:
+    os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(20))
+  except (AttributeError, PermissionError, OSError):
+    pass
+
+  # Lock all current and future pages in RAM: a page fault mid-block is
+  # exactly the kind of multi-ms stall SCHED_FIFO is meant to prevent.
+  # Needs CAP_IPC_LOCK (or a generous RLIMIT_MEMLOCK); silent no-op without.
+  try:
+    import ctypes
+    MCL_CURRENT, MCL_FUTURE = 1, 2
+    ctypes.CDLL(None, use_errno=True).mlockall(MCL_CURRENT | MCL_FUTURE)
+  except (ImportError, AttributeError, OSError):
+    pass
+
+  # Optional: pin the decode loop to specific cores, e.g.
+  # WAKE_CPU_AFFINITY=2,3 to keep it off the cores serving arecord/node.
+  affinity = os.getenv("WAKE_CPU_AFFINITY")
+  if affinity:
+    try:
+      os.sched_setaffinity(0, {int(c) for c in affinity.split(",")})
+    except (ValueError, OSError):
+      pass
+
+def _renice_child():
+  # Runs in the forked arecord child; raising here would kill the spawn.
+  try:
+    os.nice(-10)
+  except OSError:
+    pass
+
+def _spawn_arecord(device: str, channels: int) -> subprocess.Popen:
+  cmd = [
+    "arecord",
+    "-q",
+    "-D", device,
+    "-f", "S16_LE",
+    "-c", str(channels),
+    "-r", str(SR),
+    "-t", "raw",
+  ]
+  return subprocess.Popen(
+    cmd,
+    stdout=subprocess.PIPE,
+    stderr=subprocess.PIPE,
+    bufsize=0,
+    start_new_session=True,  # make arecord its own session/process-group
+    preexec_fn=_renice_child,
+  )
+
+def _run_linux_arecord(recognizers, label, show_bar):
+  _boost_scheduling()
+
+  # Prefer mono capture: ALSA's plug layer downmixes in C, so the Python
+  # downmix below is skipped entirely. Fall back to multichannel capture
+  # + Python downmix if the device refuses -c 1.
+  channels = 1
+  device = LINUX_DEVICE if LINUX_DEVICE.startswith("plug") else f"plug:{LINUX_DEVICE}"
+  proc = _spawn_arecord(device, channels)
+  time.sleep(0.1)
+  if proc.poll() is not None:
+    print(f"⚠️  {device} refused mono capture, falling back to ch={LINUX_CHANNELS}", flush=True)
+    channels = LINUX_CHANNELS
+    device = LINUX_DEVICE
+    proc = _spawn_arecord(device, channels)
+
+  print(f"🎤 Listening for {label} (device={device}, ch={channels}, sr={SR})", flush=True)
+  print("-" * 50, flush=True)
+
+  assert proc.stdout is not None
+
+  bytes_per_frame = 2 * channels
+  chunk_bytes = BLOCK * bytes_per_frame
+  fd = proc.stdout.fileno()
+
+  # Enlarge the kernel pipe so arecord can ride out a slow decode burst
+  # without blocking (Linux-only fcntl; best-effort).
+  try:
+    fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, chunk_bytes * 4)
+  except (AttributeError, OSError):
+    pass
+
+  # Route SIGTERM/SIGINT through a wakeup pipe watched by the select below.
+  # Python only delivers signals between bytecodes, so a handler alone
+  # would wait out a blocking pipe read; the wakeup fd unblocks it at once.
+  rsig, wsig = os.pipe2(os.O_NONBLOCK)
+  signal.set_wakeup_fd(wsig)
+  signal.signal(signal.SIGTERM, lambda signum, frame: None)
+  signal.signal(signal.SIGINT, lambda signum, frame: None)
+
+  chunk_view = memoryview(bytearray(chunk_bytes))
+
+  def _read_chunk():
+    # Fill the one preallocated chunk buffer with readv — no intermediate
+    # bytes object per short read; pipes are allowed to return them.
+    # Returns None if a termination signal arrived mid-read.
+    pos = 0
+    while pos < chunk_bytes:
+      ready, _, _ = select.select([fd, rsig], [], [])
+      if rsig in ready:
+        return None
+      n = os.readv(fd, [chunk_view[pos:]])
+      if n <= 0:
+        break
+      pos += n
+    return bytes(chunk_view[:pos])
+
+  def _drain_stderr(p: subprocess.Popen) -> str:
+    try:
+      if p.stderr is None:
+        return ""
+      data = p.stderr.read() or b""
+      return data.decode("utf-8", errors="replace").strip()
+    except Exception:
+      return ""
+
+  def cleanup():
+    # Stop arecord cleanly, then hard-kill if it doesn't exit quickly.
+    try:
+      proc.terminate()
+    except Exception:
+      pass
+
+    deadline = time.time() + 0.5
+    while time.time() < deadline:
+      if proc.poll() is not None:
+        return
+      time.sleep(0.05)
+
+    try:
+      proc.kill()
+    except Exception:
+      pass
+
+  gate = _VadGate()
+  batch = _Batch()
+  last_draw = 0.0
+
+  # Capture thread keeps draining the pipe even when a decode runs long,
+  # so arecord never stalls on a full pipe and drops samples. Bounded
+  # deque: if the decoder falls behind, the oldest audio is dropped.
+  chunks = collections.deque(maxlen=16)
+  chunk_ready = threading.Event()
+  capture_done = threading.Event()
+  stop_reason = {}
+
+  def _capture():
+    while True:
+      raw = _read_chunk()
+      if raw is None:
+        stop_reason["why"] = "signal"
+        break
+      if raw == b"":
+        stop_reason["why"] = "eof"
+        break
+      chunks.append(raw)
+      chunk_ready.set()
+    capture_done.set()
+    chunk_ready.set()
+
+  threading.Thread(target=_capture, name="capture", daemon=True).start()
+
+  # Bind hot-loop callables to locals; LOAD_FAST beats LOAD_GLOBAL +
+  # LOAD_METHOD when the loop body is this short and runs 10-40 times/s.
+  pop_chunk = chunks.popleft
+  wait_ready = chunk_ready.wait
+  clear_ready = chunk_ready.clear
+  capture_is_done = capture_done.is_set
+  level_of = chunk_level
+  voiced = gate.voiced
+  batch_add = batch.add
+  batch_flush = batch.flush
+  process = _process_chunk
+  monotonic = time.monotonic
+
+  try:
+    while True:
+      if capture_is_done():
+        if stop_reason.get("why") == "eof":
+          # arecord ended or pipe broke
+          rc = proc.poll()
+          msg = _drain_stderr(proc)
+          print(
+            f"AUDIO_ERROR: arecord exited (code={rc}). {msg}",
+            file=sys.stderr,
+            flush=True,
+          )
+          sys.exit(1)
+        sys.exit(0)  # SIGTERM/SIGINT; cleanup runs in the finally block
+
+      try:
+        raw = pop_chunk()
+      except IndexError:
+        wait_ready()
+        clear_ready()
+        continue
+
+      mono = raw if channels == 1 else downmix_to_mono(raw, channels)
+
+      level = level_of(mono)
+      partial = ""
+      if voiced(level):
+        pending = batch_add(mono)
+        if gate.closed_edge and pending is None:
+          # Last hangover block: push the remainder so the utterance
+          # tail isn't stuck waiting for more speech.
+          pending = batch_flush()
+        if pending is not None:
+          done, partial = process(recognizers, pending)
+          if done:
+            return
+        if gate.closed_edge:
+          # Entering silence: clear decoder state so a stale partial
+          # can't bleed into the next utterance while the gate is shut.
+          for rec, _ in recognizers:
+            rec.Reset()
+      if show_bar:
+        # Throttle redraws to <=20 Hz; flushed TTY writes aren't free.
+        now = monotonic()
+        if now - last_draw > 0.05:
+          last_draw = now
+          print(f"\r{audio_level_bar(level)} | {partial[:30]:30s}", end="", flush=True)
+  finally:
+    cleanup()
+
+def _run_non_linux_sounddevice(recognizers, label, show_bar):
+  import sounddevice as sd
+
+  # deque.append is atomic under the GIL and never takes queue.Queue's
+  # mutex + condition pair inside PortAudio's realtime callback. Bounded
+  # so a slow decoder drops the oldest audio instead of growing unbounded.
+  buf = collections.deque(maxlen=64)
+  data_ready = threading.Event()
+
+  def cb(indata, frames, time, status):
+    if status:
+      print(f"{status}", file=sys.stderr, flush=True)
+    buf.append(bytes(indata))
+    data_ready.set()
+
+  with sd.RawInputStream(channels=1, samplerate=SR, blocksize=BLOCK, dtype="int16", callback=cb):
+    print(f"🎤 Listening for {label} (sounddevice)...", flush=True)
+    print("-" * 50, flush=True)
+
+    gate = _VadGate()
+    batch = _Batch()
+    last_draw = 0.0
+
+    # Bind hot-loop callables to locals; LOAD_FAST beats LOAD_GLOBAL +
+    # LOAD_METHOD when the loop body is this short and runs 10-40 times/s.
+    pop_chunk = buf.popleft
+    wait_ready = data_ready.wait
+    clear_ready = data_ready.clear
+    level_of = chunk_level
+    voiced = gate.voiced
+    batch_add = batch.add
+    batch_flush = batch.flush
+    process = _process_chunk
+    monotonic = time.monotonic
+
+    while True:
+      try:
+        data = pop_chunk()
+      except IndexError:
+        wait_ready()
+        clear_ready()
+        continue
+
+      level = level_of(data)
+      partial = ""
+      if voiced(level):
+        pending = batch_add(data)
+        if gate.closed_edge and pending is None:
+          # Last hangover block: push the remainder so the utterance
+          # tail isn't stuck waiting for more speech.
+          pending = batch_flush()
+        if pending is not None:
+          done, partial = process(recognizers, pending)
+          if done:
+            return
+        if gate.closed_edge:
+          # Entering silence: clear decoder state so a stale partial
+          # can't bleed into the next utterance while the gate is shut.
+          for rec, _ in recognizers:
+            rec.Reset()
+      if show_bar:
+        # Throttle redraws to <=20 Hz; flushed TTY writes aren't free.
+        now = monotonic()
+        if now - last_draw > 0.05:
+          last_draw = now
+          print(f"\r{audio_level_bar(level)} | {partial[:30]:30s}", end="", flush=True)
+
+def run(recognizers, label="speech", show_bar=True):
+  """Pump mic audio through [(recognizer, handle_text)] pairs.
+
+  Returns once any handler returns True; exits the process on audio errors.
+  """
+  # The bar is for a human at a terminal. In production stdout is a pipe
+  # to the Node parent, which only greps for WAKE/SHUTDOWN lines — bar
+  # redraws there are wasted writes the parent has to read past.
+  show_bar = show_bar and sys.stdout.isatty()
+
+  if IS_LINUX:
+    _run_linux_arecord(recognizers, label, show_bar)
+  else:
+    _run_non_linux_sounddevice(recognizers, label, show_bar)
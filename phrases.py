@@ -0,0 +1,51 @@
+"""Phrase lists and combined grammars for the listeners.
+
+Kept free of capture/recognition side effects so build_grammars.py can
+dump the combined grammars to grammars/*.json at build time.
+"""
+import hashlib
+import os
+
+import volume
+import filler_words
+
+ASSISTANT_NAME = os.getenv("ASSISTANT_NAME", "Winter fresh")
+
+WAKE_WORDS = [
+  f'{ASSISTANT_NAME.lower()}',
+  f'hey {ASSISTANT_NAME.lower()}',
+]
+
+SHUTDOWN_PHRASES = [
+  f'{ASSISTANT_NAME.lower()} stop',
+  f'hey {ASSISTANT_NAME.lower()} stop',
+  'stop',
+  'be quiet',
+  'quiet',
+  'enough',
+  'thats enough',
+  'i got it',
+  'got it',
+  'never mind',
+  'nevermind',
+  'go away',
+  'go to sleep',
+  'goodbye',
+  'bye',
+]
+
+# Combined grammars: action phrases + filler sinks
+WAKE_GRAMMAR = WAKE_WORDS + volume.VOLUME_WORDS + filler_words.FILLER_PHRASES
+SHUTDOWN_GRAMMAR = SHUTDOWN_PHRASES + filler_words.FILLER_PHRASES
+
+
+def grammar_cache_name(name: str, phrase_list: list) -> str:
+  """Filename for the on-disk grammar cache under grammars/.
+
+  Keyed by a hash of the phrases so edits to the lists or ASSISTANT_NAME
+  invalidate stale cache files by construction: an old file just stops
+  being looked up. Shared by build_grammars.py and listener.py so both
+  always agree on the name.
+  """
+  digest = hashlib.sha1("\n".join(sorted(phrase_list)).encode()).hexdigest()[:12]
+  return f"{name}-{digest}.json"
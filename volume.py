@@ -1,4 +1,11 @@
-import os, subprocess
+import array, io, os, re, struct, subprocess, wave
+
+try:
+  # Optional: talks to libasound directly, skipping an amixer fork+exec
+  # per volume command. Falls back to amixer when unavailable.
+  import alsaaudio
+except ImportError:
+  alsaaudio = None
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 CHIME_PATH = os.path.join(SCRIPT_DIR, "sounds", "volume-confirm.wav")
@@ -23,45 +30,152 @@ VOLUME_WORDS = [
   f'{ASSISTANT_NAME.lower()} volume ten',
 ]
 
+# Frozenset for O(1) exact-match checks; the list above keeps grammar order.
+VOLUME_WORD_SET = frozenset(VOLUME_WORDS)
+
+def _load_chime_pcm():
+  """Read CHIME_PATH and return (samples, rate) as 16-bit mono PCM.
+
+  The shipped chime is WAVE_FORMAT_EXTENSIBLE 32-bit PCM, which the stdlib
+  wave module refuses to open, so walk the RIFF chunks by hand.
+  """
+  with open(CHIME_PATH, "rb") as f:
+    data = f.read()
+
+  rate, bits, channels = 0, 0, 1
+  frames = b""
+  pos = 12
+  while pos + 8 <= len(data):
+    cid, size = struct.unpack_from("<4sI", data, pos)
+    if cid == b"fmt ":
+      _, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", data, pos + 8)
+    elif cid == b"data":
+      frames = data[pos + 8:pos + 8 + size]
+    pos += 8 + size + (size & 1)
+
+  if bits == 16:
+    samples = array.array("h", frames)
+  elif bits == 32:
+    samples = array.array("h", (s >> 16 for s in array.array("i", frames)))
+  else:
+    raise ValueError(f"unsupported chime format: {bits}-bit")
+
+  if channels > 1:
+    samples = samples[::channels]
+  return samples, rate
+
+def _render_chimes():
+  """Pre-scale the chime for every volume level.
+
+  Done once at import so play_chime is a single device write per volume
+  change — no sox invocation, shell parse, or disk read. Returns
+  (wav_blobs, pcm_blobs, rate): WAV blobs feed aplay/play over stdin,
+  raw PCM blobs feed the persistent ALSA handle.
+  """
+  try:
+    samples, rate = _load_chime_pcm()
+  except (OSError, ValueError) as e:
+    print(f"⚠️  Chime not loaded ({CHIME_PATH}): {e}", flush=True)
+    return {}, {}, 0
+
+  wavs, pcms = {}, {}
+  for level in range(0, 11):
+    amplitude = level / 10.0
+    if (level < 1):
+      amplitude = 0.1  # minimal audible for volume 0
+    scaled = array.array("h", (int(s * amplitude) for s in samples))
+    pcms[level] = scaled.tobytes()
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+      w.setnchannels(1)
+      w.setsampwidth(2)
+      w.setframerate(rate)
+      w.writeframes(pcms[level])
+    wavs[level] = buf.getvalue()
+  return wavs, pcms, rate
+
+_CHIMES, _CHIME_PCM, _CHIME_RATE = _render_chimes()
+
+_PLAYBACK = None
+
+def _get_playback():
+  """Open the ALSA playback device once and keep it for the process lifetime.
+
+  snd_pcm_open on USB audio can cost tens of ms; a persistent handle pays
+  it once instead of per chime.
+  """
+  global _PLAYBACK
+  if _PLAYBACK is None and alsaaudio is not None and _CHIME_RATE:
+    try:
+      pcm = alsaaudio.PCM(type=alsaaudio.PCM_PLAYBACK, device=ALSA_PLAY_DEVICE)
+      pcm.setchannels(1)
+      pcm.setrate(_CHIME_RATE)
+      pcm.setformat(alsaaudio.PCM_FORMAT_S16_LE)
+      pcm.setperiodsize(1024)
+      _PLAYBACK = pcm
+    except alsaaudio.ALSAAudioError as e:
+      print(f"⚠️  ALSA playback unavailable, using aplay: {e}", flush=True)
+  return _PLAYBACK
+
 def play_chime(volume_level: int):
   """Play confirmation chime at a volume proportional to the level (0-10)."""
-  if not os.path.exists(CHIME_PATH):
-    print(f"⚠️  Chime not found: {CHIME_PATH}", flush=True)
+  level = max(0, min(10, volume_level))
+  wav = _CHIMES.get(level)
+  if wav is None:
+    print(f"⚠️  Chime not available: {CHIME_PATH}", flush=True)
     return
-  
-  amplitude = volume_level / 10.0
-  if (volume_level < 1):
-    amplitude = 0.1  # minimal audible for volume 0
-  
+
+  if IS_LINUX:
+    playback = _get_playback()
+    if playback is not None:
+      try:
+        playback.write(_CHIME_PCM[level])
+        return
+      except alsaaudio.ALSAAudioError as e:
+        print(f"⚠️  ALSA chime write failed, using aplay: {e}", flush=True)
+    cmd = ["aplay", "-q", "-D", ALSA_PLAY_DEVICE]
+  else:
+    cmd = ["play", "-q", "-t", "wav", "-"]
+
   try:
-    if IS_LINUX:
-      subprocess.run(
-        f"sox {CHIME_PATH} -t wav - vol {amplitude} | aplay -q -D {ALSA_PLAY_DEVICE}",
-        shell=True,
-        check=True,
-        timeout=2,
-      )
-    else:
-      subprocess.run(
-        f"sox {CHIME_PATH} -t wav - vol {amplitude} | play -q -",
-        shell=True,
-        check=True,
-        timeout=2,
-      )
+    subprocess.run(cmd, input=wav, check=True, timeout=2)
   except subprocess.TimeoutExpired:
     print("⚠️  Chime playback timed out", flush=True)
-  except subprocess.CalledProcessError as e:
+  except (subprocess.CalledProcessError, FileNotFoundError) as e:
     print(f"⚠️  Chime playback failed: {e}", flush=True)
 
+_MIXER = None
+
+def _get_mixer():
+  """Open the ALSA PCM mixer once and keep it for the process lifetime."""
+  global _MIXER
+  if _MIXER is None and alsaaudio is not None:
+    try:
+      _MIXER = alsaaudio.Mixer('PCM', cardindex=int(ALSA_CARD))
+    except alsaaudio.ALSAAudioError as e:
+      print(f"⚠️  ALSA mixer unavailable, using amixer: {e}", flush=True)
+  return _MIXER
+
 def set_volume(level: int):
   """Set system volume (0-10 scale -> 0-100% in ALSA)."""
   if not IS_LINUX:
     print(f"Volume control not implemented for {os.sys.platform}", flush=True)
     play_chime(level)
     return
-  
+
   percent = level * 10
-  
+
+  mixer = _get_mixer()
+  if mixer is not None:
+    try:
+      mixer.setvolume(percent)
+      print(f"🔊 Volume set to {level}/10 ({percent}%)", flush=True)
+      play_chime(level)
+      return
+    except alsaaudio.ALSAAudioError as e:
+      print(f"❌ Failed to set volume: {e}", file=os.sys.stderr, flush=True)
+      return
+
   try:
     subprocess.run(
       ["amixer", "-c", ALSA_CARD, "sset", "PCM", f"{percent}%"],
@@ -73,23 +187,15 @@ def set_volume(level: int):
   except subprocess.CalledProcessError as e:
     print(f"❌ Failed to set volume: {e.stderr.decode()}", file=os.sys.stderr, flush=True)
 
+# One alternation regex covers both word and digit forms in a single pass.
+_NUMBER_WORDS = ['zero', 'one', 'two', 'three', 'four', 'five',
+                 'six', 'seven', 'eight', 'nine', 'ten']
+_NUMBER_MAP = {word: num for num, word in enumerate(_NUMBER_WORDS)}
+_VOLUME_RE = re.compile(r'\b(?:(%s)|(10|[0-9]))\b' % '|'.join(_NUMBER_WORDS))
+
 def parse_volume_level(text: str) -> int | None:
   """Extract volume level (0-10) from recognized text."""
-  text = (text or "").lower()
-
-  number_map = {
-    'zero': 0,
-    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
-    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
-  }
-
-  # Handle digit forms too ("volume 0", "volume 10")
-  for n in range(0, 11):
-    if f" {n}" in f" {text}":
-      return n
-
-  for word, num in number_map.items():
-    if word in text:
-      return num
-
-  return None
\ No newline at end of file
+  m = _VOLUME_RE.search((text or "").lower())
+  if not m:
+    return None
+  return _NUMBER_MAP[m.group(1)] if m.group(1) else int(m.group(2))
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""Process-wide Vosk model cache.
+
+Loading the small English model maps ~40MB and takes seconds, so
+get_model is lru_cached: at most one instance per process no matter how
+many modules ask for it, and safe for hot-reload setups that re-import
+callers.
+"""
+import os
+from functools import lru_cache
+
+# Pin the BLAS/OpenMP pools to one thread before Kaldi/OpenBLAS load.
+# The decoder's matmuls are small; a thread pool only adds scheduler
+# jitter next to the audio loop. Values already in the environment win.
+for _var in ("OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "OMP_NUM_THREADS"):
+  os.environ.setdefault(_var, "1")
+
+from vosk import Model, SetLogLevel
+
+SetLogLevel(-1)  # Kaldi's stderr logging is pure overhead in production
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(SCRIPT_DIR, "models/vosk-model-small-en-us-0.15")
+
+
+@lru_cache(maxsize=1)
+def get_model(path: str = MODEL_PATH) -> Model:
+  return Model(path)